@@ -0,0 +1,124 @@
+"""
+Multi-chart transit alerts - sorted natal longitude index with sharding
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from zlib import crc32
+
+
+def shard_of(chart_id, shard_count):
+    """Stable shard number for a chart id, identical on every worker"""
+    return crc32(str(chart_id).encode("utf-8")) % shard_count
+
+
+def _arcs(lon, orb):
+    """Longitude ranges covered by lon +/- orb, split at the 0/360 seam"""
+    if orb >= 180:
+        return [(0.0, 360.0)]
+    low, high = lon - orb, lon + orb
+    if low < 0:
+        return [(low + 360.0, 360.0), (0.0, high)]
+    if high >= 360:
+        return [(low, 360.0), (0.0, high - 360.0)]
+    return [(low, high)]
+
+
+class NatalIndex:
+    """
+    Natal longitudes of many registered charts, kept per planet as a sorted
+    array so "which natal planets lie within orb of X" is a range query.
+
+    With shard_count > 1 the index only accepts charts hashing to `shard`,
+    so each worker holds and queries its own slice of the user base.
+    """
+
+    def __init__(self, shard=0, shard_count=1):
+        if shard_count < 1:
+            raise ValueError(f"Shard count must be at least 1, got {shard_count}")
+        if not 0 <= shard < shard_count:
+            raise ValueError(f"Shard must be in [0, {shard_count}), got {shard}")
+        self.shard = shard
+        self.shard_count = shard_count
+        self._charts = {}
+        self._index = {}
+        self._dirty = False
+        # Registrations and rebuilds may run concurrently in the threadpool;
+        # _lock guards the chart map, _build_lock keeps rebuilds in order
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._charts)
+
+    def owns(self, chart_id):
+        return shard_of(chart_id, self.shard_count) == self.shard
+
+    def add(self, chart_id, planet_longitudes):
+        """Register (or replace) a chart; returns False if it belongs to another shard"""
+        if not self.owns(chart_id):
+            return False
+        lons = {planet: lon % 360.0 for planet, lon in planet_longitudes.items()
+                if planet != "Ascendant"}
+        with self._lock:
+            self._charts[chart_id] = lons
+            self._dirty = True
+        return True
+
+    def remove(self, chart_id):
+        with self._lock:
+            if self._charts.pop(chart_id, None) is not None:
+                self._dirty = True
+
+    def _current_index(self):
+        """Sorted per-planet arrays, rebuilt from a snapshot if charts changed"""
+        with self._build_lock:
+            with self._lock:
+                if not self._dirty:
+                    return self._index
+                # Clear the flag before building so a concurrent add marks it again
+                charts = list(self._charts.items())
+                self._dirty = False
+
+            rows = {}
+            for chart_id, lons in charts:
+                for planet, lon in lons.items():
+                    rows.setdefault(planet, []).append((lon, chart_id))
+
+            index = {}
+            for planet, entries in rows.items():
+                entries.sort(key=lambda entry: entry[0])
+                index[planet] = (array("d", [lon for lon, _ in entries]),
+                                 [chart_id for _, chart_id in entries])
+
+            self._index = index
+            return index
+
+    def within_orb(self, lon, orb):
+        """Yield (chart_id, natal planet, natal longitude) within orb of lon"""
+        for planet, (lons, chart_ids) in self._current_index().items():
+            for low, high in _arcs(lon % 360.0, orb):
+                for i in range(bisect_left(lons, low), bisect_right(lons, high)):
+                    yield chart_ids[i], planet, lons[i]
+
+    def transit_hits(self, transiting_planets, orb=3.0):
+        """Transit conjunctions to every indexed chart, as compute_transit_hits does per chart"""
+        hits = []
+
+        for t_planet, t_data in transiting_planets.items():
+            if t_planet == "Ascendant":
+                continue
+            t_lon = t_data['longitude']
+
+            for chart_id, n_planet, n_lon in self.within_orb(t_lon, orb):
+                diff = abs((t_lon - n_lon + 180) % 360 - 180)
+                hits.append({
+                    "chart_id": chart_id,
+                    "transit_planet": t_planet,
+                    "natal_planet": n_planet,
+                    "aspect": "Conjunction",
+                    "orb": round(diff, 2),
+                    "exact": diff < 1.0
+                })
+
+        return hits
@@ -1,66 +1,154 @@
 """
 Core Swiss Ephemeris utilities and position calculations
 """
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
 import swisseph as swe
-from datetime import datetime, timedelta
-
-
-def compute_positions(date, time, timezone_offset, lat, lon, ayanamsa="LAHIRI"):
-    """Compute planetary positions and basic chart data"""
-    # Parse date and time
-    date_parts = [int(x) for x in date.split("-")]
-    time_parts = [int(x) for x in time.split(":")]
-    utc_dt = datetime(date_parts[0], date_parts[1], date_parts[2],
-                      time_parts[0], time_parts[1]) - timedelta(hours=timezone_offset)
-    
-    # Calculate Julian Day
-    jd_ut = swe.julday(utc_dt.year, utc_dt.month, utc_dt.day,
-                       utc_dt.hour + utc_dt.minute/60.0)
-    
-    # Set ayanamsa
-    ayanamsa_map = {
-        "LAHIRI": swe.SIDM_LAHIRI,
-        "RAMAN": swe.SIDM_RAMAN,
-        "KRISHNAMURTI": swe.SIDM_KRISHNAMURTI
-    }
-    swe.set_sid_mode(ayanamsa_map.get(ayanamsa, swe.SIDM_LAHIRI))
-    
-    # Calculate planetary positions
-    planets = {"Sun":swe.SUN, "Moon":swe.MOON, "Mercury":swe.MERCURY,
-               "Venus":swe.VENUS, "Mars":swe.MARS, "Jupiter":swe.JUPITER,
-               "Saturn":swe.SATURN, "Rahu":swe.MEAN_NODE}
-    
-    sign_names = ["Aries","Taurus","Gemini","Cancer","Leo","Virgo",
-                  "Libra","Scorpio","Sagittarius","Capricorn","Aquarius","Pisces"]
-    
+
+from . import geotime
+from .errors import InvalidOption
+
+SIGN_NAMES = ["Aries","Taurus","Gemini","Cancer","Leo","Virgo",
+              "Libra","Scorpio","Sagittarius","Capricorn","Aquarius","Pisces"]
+
+# Every ayanamsa the Swiss Ephemeris provides, keyed without the SIDM_ prefix
+AYANAMSAS = {name[5:]: getattr(swe, name) for name in dir(swe)
+             if name.startswith("SIDM_") and name != "SIDM_USER"}
+
+HOUSE_SYSTEMS = {
+    "PLACIDUS": b"P",
+    "WHOLE_SIGN": b"W",
+    "EQUAL": b"E",
+    "SRIPATI": b"S",
+    "PORPHYRY": b"O",
+    "KOCH": b"K",
+    "REGIOMONTANUS": b"R",
+    "CAMPANUS": b"C"
+}
+
+NODES = {"MEAN": swe.MEAN_NODE, "TRUE": swe.TRUE_NODE}
+
+# Precomputed settings for one flag combination, shared by every request using it
+ChartFlags = namedtuple("ChartFlags",
+                        "ayanamsa sid_mode house_system hsys iflag speed topocentric planets")
+
+# The Swiss Ephemeris keeps sidereal mode and observer position in library
+# globals, so they are only set while holding this lock
+_swe_lock = threading.Lock()
+
+
+def chart_flags(ayanamsa="LAHIRI", house_system="PLACIDUS", node="MEAN",
+                speed=True, topocentric=False):
+    """Call context for a combination of calculation options, shared across requests"""
+    ayanamsa, house_system, node = ayanamsa.upper(), house_system.upper(), node.upper()
+    if ayanamsa not in AYANAMSAS:
+        raise InvalidOption(f"Unknown ayanamsa: {ayanamsa}")
+    if house_system not in HOUSE_SYSTEMS:
+        raise InvalidOption(f"Unknown house system: {house_system}")
+    if node not in NODES:
+        raise InvalidOption(f"Unknown node type: {node}")
+    return _chart_flags(ayanamsa, house_system, node, bool(speed), bool(topocentric))
+
+
+@lru_cache(maxsize=None)
+def _chart_flags(ayanamsa, house_system, node, speed, topocentric):
+    """Build (once) the context for canonical, already validated option names"""
+    iflag = swe.FLG_SWIEPH | swe.FLG_SIDEREAL
+    if speed:
+        iflag |= swe.FLG_SPEED
+    if topocentric:
+        iflag |= swe.FLG_TOPOCTR
+
+    planets = (("Sun", swe.SUN), ("Moon", swe.MOON), ("Mercury", swe.MERCURY),
+               ("Venus", swe.VENUS), ("Mars", swe.MARS), ("Jupiter", swe.JUPITER),
+               ("Saturn", swe.SATURN), ("Rahu", NODES[node]))
+
+    return ChartFlags(ayanamsa, AYANAMSAS[ayanamsa], house_system,
+                      HOUSE_SYSTEMS[house_system], iflag, speed, topocentric, planets)
+
+
+@contextmanager
+def ephemeris(flags, lat=0.0, lon=0.0):
+    """Hold the ephemeris with the sidereal mode (and observer) of `flags` applied"""
+    with _swe_lock:
+        swe.set_sid_mode(flags.sid_mode)
+        if flags.topocentric:
+            swe.set_topo(lon, lat, 0)
+        yield
+
+
+def calc_body(jd_ut, pid, flags):
+    """Sidereal position/speed of one body; call inside ephemeris()"""
+    if pid == swe.TRUE_NODE:
+        # The library's sidereal true node fails for star- and galaxy-based
+        # ayanamsas (TRUE_CITRA, GALCENT_*, ...), so subtract the ayanamsa
+        # from the tropical node instead
+        tropical = flags.iflag & ~swe.FLG_SIDEREAL
+        xx = list(swe.calc_ut(jd_ut, pid, tropical)[0])
+        xx[0] = (xx[0] - swe.get_ayanamsa_ex_ut(jd_ut, tropical)[1]) % 360.0
+        return xx
+    return swe.calc_ut(jd_ut, pid, flags.iflag)[0]
+
+
+def compute_positions(date, time, timezone_offset, lat, lon, flags=None,
+                      timezone=None):
+    """
+    Compute planetary positions and basic chart data
+
+    When `timezone_offset` is None the offset is resolved from the IANA
+    `timezone`, or from the zone containing lat/lon. `flags` (from
+    chart_flags) is the only way to select ayanamsa, houses, node and
+    flags; without it the defaults (Lahiri, Placidus, mean node) apply.
+    """
+    # Resolve UTC offset and calculate Julian Day
+    offset, timezone = geotime.resolve_offset(date, time, lat, lon,
+                                              timezone_offset, timezone)
+    jd_ut = geotime.local_to_jd(date, time, offset)
+
+    if flags is None:
+        flags = chart_flags()
+
+    # Calculate planetary positions, Ascendant and house cusps
+    with ephemeris(flags, lat, lon):
+        results = [(name, calc_body(jd_ut, pid, flags)) for name, pid in flags.planets]
+        houses_data = swe.houses_ex(jd_ut, lat, lon, flags.hsys, swe.FLG_SIDEREAL)
+
     planet_data = {}
     planet_lons = {}
-    
-    for name, pid in planets.items():
-        result = swe.calc_ut(jd_ut, pid)
-        lon = result[0][0] % 360.0
-        speed = result[0][3] if len(result[0]) > 3 else 0
-        planet_lons[name] = lon
+
+    for name, xx in results:
+        planet_lon = xx[0] % 360.0
+        planet_lons[name] = planet_lon
         planet_data[name] = {
-            "longitude": round(lon, 3),
-            "sign": sign_names[int(lon/30)],
-            "retrograde": speed < 0
+            "longitude": round(planet_lon, 3),
+            "sign": SIGN_NAMES[int(planet_lon/30)],
+            # Unknown without the speed flag
+            "retrograde": xx[3] < 0 if flags.speed else None
         }
-    
-    # Calculate Ascendant and house cusps
-    houses_data = swe.houses(jd_ut, lat, lon)
+
     cusps = houses_data[0]
     asc = houses_data[1][0]
-    
+    if flags.house_system == "WHOLE_SIGN":
+        # Whole sign houses start at the Ascendant's sign; the library's 'W'
+        # cusps drift off sign boundaries for ecliptic-projection ayanamsas
+        cusps = [((int(asc/30) + i) % 12) * 30.0 for i in range(12)]
+
     house_cusps = {str(i+1): round(cusps[i], 3) for i in range(12)}
-    
+
     planet_data["Ascendant"] = {
         "longitude": round(asc, 3),
-        "sign": sign_names[int(asc/30)]
+        "sign": SIGN_NAMES[int(asc/30)]
     }
-    
+
     return {
         "jd": jd_ut,
+        "timezone": timezone,
+        "utc_offset": offset,
+        "ayanamsa": flags.ayanamsa,
+        "house_system": flags.house_system,
         "planets": planet_data,
         "planet_longitudes": planet_lons,
         "ascendant": asc,
@@ -1,93 +1,304 @@
 """
-Dasha (time period) calculations - Vimshottari, Yogini, etc.
+Dasha (time period) calculations - Vimshottari, Yogini, Ashtottari, Chara
 """
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
 import swisseph as swe
 
+from . import core
 
-def compute_vimshottari(jd_ut):
-    """Calculate Vimshottari Dasha periods"""
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
-    moon_lon = swe.calc_ut(jd_ut, swe.MOON)[0][0] % 360.0
-    nak_index = int(moon_lon / (360.0/27.0))
-    nak_frac = (moon_lon % (360.0/27.0)) / (360.0/27.0)
-    pada = int(nak_frac * 4) + 1
-
-    nak_names = ["Ashwini","Bharani","Krittika","Rohini","Mrigashira","Ardra","Punarvasu",
-                 "Pushya","Ashlesha","Magha","Purva Phalguni","Uttara Phalguni","Hasta",
-                 "Chitra","Swati","Vishakha","Anuradha","Jyeshtha","Mula","Purva Ashadha",
-                 "Uttara Ashadha","Shravana","Dhanishta","Shatabhisha",
-                 "Purva Bhadrapada","Uttara Bhadrapada","Revati"]
-
-    rulers = ['Ketu','Venus','Sun','Moon','Mars','Rahu','Jupiter','Saturn','Mercury']*3
-    ruler = rulers[nak_index]
-    nak_name = nak_names[nak_index]
-
-    dasha_years = {
-        'Ketu':7,'Venus':20,'Sun':6,'Moon':10,'Mars':7,
-        'Rahu':18,'Jupiter':16,'Saturn':19,'Mercury':17
+DAYS_PER_YEAR = 365.25
+NAKSHATRA_SPAN = 360.0 / 27.0
+
+# Periods are generated until this many years from the start of the birth dasha
+HORIZON_YEARS = 120.0
+
+NAK_NAMES = ["Ashwini","Bharani","Krittika","Rohini","Mrigashira","Ardra","Punarvasu",
+             "Pushya","Ashlesha","Magha","Purva Phalguni","Uttara Phalguni","Hasta",
+             "Chitra","Swati","Vishakha","Anuradha","Jyeshtha","Mula","Purva Ashadha",
+             "Uttara Ashadha","Shravana","Dhanishta","Shatabhisha",
+             "Purva Bhadrapada","Uttara Bhadrapada","Revati"]
+
+SIGN_NAMES = ["Aries","Taurus","Gemini","Cancer","Leo","Virgo",
+              "Libra","Scorpio","Sagittarius","Capricorn","Aquarius","Pisces"]
+
+# A dasha system is described by its cyclic lord sequence and a starting-point
+# rule; everything else (period tree, sub-periods, lookup) is shared.
+#   lords       - cyclic order of period lords
+#   years       - full period of each lord, or None if it depends on the chart
+#   start       - rule(longitudes) -> (start index, elapsed fraction of the
+#                 first period, direction +1/-1, years by index or None)
+#   sub_weights - relative sub-period lengths, defaults to years
+#   sub_offset  - sub-periods start this many steps after the parent lord
+#   cycle_years - rule(years, cycle) -> years for a later cycle, or None to repeat
+DashaSystem = namedtuple("DashaSystem",
+                         "lords years start sub_weights sub_offset cycle_years")
+
+
+def _vimshottari_start(lons):
+    moon_lon = lons["Moon"]
+    nak_index = int(moon_lon / NAKSHATRA_SPAN)
+    nak_frac = (moon_lon % NAKSHATRA_SPAN) / NAKSHATRA_SPAN
+    return nak_index % 9, nak_frac, 1, None
+
+
+def _yogini_start(lons):
+    moon_lon = lons["Moon"]
+    nak_index = int(moon_lon / NAKSHATRA_SPAN)
+    nak_frac = (moon_lon % NAKSHATRA_SPAN) / NAKSHATRA_SPAN
+    # (nakshatra number + 3) mod 8, counted from Mangala
+    return (nak_index + 3) % 8, nak_frac, 1, None
+
+
+# Ashtottari lords rule groups of nakshatras counted from Ardra
+# (Abhijit folded into Saturn's group)
+_ASHTOTTARI_GROUPS = (4, 3, 4, 3, 3, 3, 4, 3)
+_ASHTOTTARI_NAK = []
+for _lord, _count in enumerate(_ASHTOTTARI_GROUPS):
+    _first = len(_ASHTOTTARI_NAK)
+    _ASHTOTTARI_NAK.extend([(_lord, _first, _count)] * _count)
+_ASHTOTTARI_NAK = tuple(_ASHTOTTARI_NAK)
+
+
+def _ashtottari_start(lons):
+    rel = (lons["Moon"] - 5 * NAKSHATRA_SPAN) % 360.0
+    lord, first, count = _ASHTOTTARI_NAK[int(rel / NAKSHATRA_SPAN)]
+    elapsed = (rel - first * NAKSHATRA_SPAN) / (count * NAKSHATRA_SPAN)
+    return lord, elapsed, 1, None
+
+
+SIGN_LORDS = ["Mars","Venus","Mercury","Moon","Sun","Mercury",
+              "Venus","Mars","Jupiter","Saturn","Saturn","Jupiter"]
+_CO_LORDS = {7: "Ketu", 10: "Rahu"}
+# Savya (direct) signs; the rest are counted in reverse
+_SAVYA_SIGNS = (0, 1, 2, 6, 7, 8)
+
+
+def _planet_sign(lons, planet):
+    if planet == "Ketu":
+        return int(((lons["Rahu"] + 180.0) % 360.0) / 30)
+    return int(lons[planet] / 30)
+
+
+def _chara_years(sign, lons):
+    """Count from a sign to its lord, less one; a lord in its own sign gives 12"""
+    counts = []
+    for lord in [SIGN_LORDS[sign]] + ([_CO_LORDS[sign]] if sign in _CO_LORDS else []):
+        lord_sign = _planet_sign(lons, lord)
+        if sign in _SAVYA_SIGNS:
+            counts.append((lord_sign - sign) % 12)
+        else:
+            counts.append((sign - lord_sign) % 12)
+
+    # Dual lordship (K.N. Rao): when one co-lord occupies the sign, count to
+    # the other; otherwise take the co-lord giving the longer period
+    away = [count for count in counts if count]
+    return max(away) if away else 12
+
+
+def _chara_start(lons):
+    asc_sign = int(lons["Ascendant"] / 30)
+    step = 1 if (asc_sign + 8) % 12 in _SAVYA_SIGNS else -1
+    years = tuple(_chara_years(sign, lons) for sign in range(12))
+    return asc_sign, 0.0, step, years
+
+
+def _chara_cycle_years(years, cycle):
+    """K.N. Rao: in the second cycle each sign runs 12 less its first-cycle years"""
+    if cycle % 2 == 0:
+        return years
+    return tuple(12 - y for y in years)
+
+
+DASHA_SYSTEMS = {
+    "vimshottari": DashaSystem(
+        lords=("Ketu","Venus","Sun","Moon","Mars","Rahu","Jupiter","Saturn","Mercury"),
+        years=(7, 20, 6, 10, 7, 18, 16, 19, 17),
+        start=_vimshottari_start, sub_weights=None, sub_offset=0,
+        cycle_years=None),
+    "yogini": DashaSystem(
+        lords=("Mangala","Pingala","Dhanya","Bhramari","Bhadrika","Ulka","Siddha","Sankata"),
+        years=(1, 2, 3, 4, 5, 6, 7, 8),
+        start=_yogini_start, sub_weights=None, sub_offset=0,
+        cycle_years=None),
+    "ashtottari": DashaSystem(
+        lords=("Sun","Moon","Mars","Mercury","Saturn","Jupiter","Rahu","Venus"),
+        years=(6, 15, 8, 17, 10, 19, 12, 21),
+        start=_ashtottari_start, sub_weights=None, sub_offset=0,
+        cycle_years=None),
+    "chara": DashaSystem(
+        lords=tuple(SIGN_NAMES),
+        years=None,
+        start=_chara_start, sub_weights=(1,) * 12, sub_offset=1,
+        cycle_years=_chara_cycle_years),
+}
+
+
+@lru_cache(maxsize=None)
+def _sub_ratios(system, index, step):
+    """Ordered (lord index, fraction of parent) pairs for sub-periods of a lord"""
+    spec = DASHA_SYSTEMS[system]
+    weights = spec.sub_weights or spec.years
+    total = float(sum(weights))
+    n = len(spec.lords)
+    order = [(index + (spec.sub_offset + k) * step) % n for k in range(n)]
+    return tuple((i, weights[i] / total) for i in order)
+
+
+def _format_date(jd):
+    y, m, d, _ = swe.revjul(jd)
+    return f"{int(y)}-{int(m):02d}-{int(d):02d}"
+
+
+def _period(lord, jd_start, jd_end):
+    return {
+        "lord": lord,
+        "start": _format_date(jd_start),
+        "end": _format_date(jd_end),
+        "years": round((jd_end - jd_start) / DAYS_PER_YEAR, 2),
+        "jd_start": jd_start,
+        "jd_end": jd_end
     }
 
-    rem_frac = 1.0 - nak_frac
-    bal_years = dasha_years[ruler] * rem_frac
 
-    seq = ['Ketu','Venus','Sun','Moon','Mars','Rahu','Jupiter','Saturn','Mercury']*20
-    start_index = seq.index(ruler)
-    jd = jd_ut
+def _subdivide(system, index, step, jd_start, jd_end, depth, jd_birth):
+    """
+    Split a period into its sub-periods, `depth` levels deep
+
+    Lengths come from the full period, but like the mahadashas, sub-periods
+    are reported from birth: those over before `jd_birth` are dropped and the
+    one running at birth starts there.
+    """
+    spec = DASHA_SYSTEMS[system]
+    span = jd_end - jd_start
+    periods = []
+    jd = jd_start
+
+    for sub, ratio in _sub_ratios(system, index, step):
+        end = jd + span * ratio
+        if end > jd_birth:
+            period = _period(spec.lords[sub], max(jd, jd_birth), end)
+            if depth > 1:
+                period["sub"] = _subdivide(system, sub, step, jd, end, depth - 1,
+                                           jd_birth)
+            periods.append(period)
+        jd = end
+
+    return periods
+
+
+def _moon_longitude(jd_ut):
+    flags = core.chart_flags()
+    with core.ephemeris(flags):
+        return swe.calc_ut(jd_ut, swe.MOON, flags.iflag)[0][0] % 360.0
+
+
+def compute_dasha(system, jd_ut, chart=None, levels=2):
+    """
+    Calculate the period tree of any supported dasha system
+
+    `chart` is the result of core.compute_positions; it is required for
+    Chara dasha and saves recomputing the Moon for the nakshatra systems.
+    `levels` is the tree depth (1 = mahadasha, 2 = antardasha, ...).
+    """
+    system = system.lower()
+    if system not in DASHA_SYSTEMS:
+        raise core.InvalidOption(f"Unknown dasha system: {system}")
+
+    if chart is not None:
+        lons = dict(chart["planet_longitudes"])
+        lons["Ascendant"] = chart["ascendant"]
+    elif system == "chara":
+        raise ValueError("Chara dasha requires a computed chart")
+    else:
+        lons = {"Moon": _moon_longitude(jd_ut)}
+
+    return _dasha_tree(system, jd_ut, lons, levels)
+
+
+def _dasha_tree(system, jd_ut, lons, levels):
+    spec = DASHA_SYSTEMS[system]
+    index, elapsed, step, first_years = spec.start(lons)
+    first_years = first_years or spec.years
+    years = first_years
+    n = len(spec.lords)
+
+    # Run from the (pre-birth) start of the birth dasha up to the horizon
+    jd = jd_ut - elapsed * years[index] * DAYS_PER_YEAR
+    total_years = 0.0
     timeline = []
-    
-    for i in range(9):
-        lord = seq[start_index + i]
-        years = dasha_years[lord]
-        if i == 0:
-            years = bal_years
-        start = swe.revjul(jd)
-        jd += years * 365.25
-        end = swe.revjul(jd)
-        timeline.append({
-            "lord": lord,
-            "start": f"{int(start[0])}-{int(start[1]):02d}-{int(start[2]):02d}",
-            "end": f"{int(end[0])}-{int(end[1]):02d}-{int(end[2]):02d}",
-            "years": round(years,2)
-        })
+    count = 0
+
+    while total_years < HORIZON_YEARS - 1e-9:
+        if spec.cycle_years is not None:
+            years = spec.cycle_years(first_years, count // n)
+        # Periods reduced to nothing in a later cycle are skipped
+        if years[index] > 0:
+            end = jd + years[index] * DAYS_PER_YEAR
+            period = _period(spec.lords[index], max(jd, jd_ut), end)
+            if levels > 1:
+                period["sub"] = _subdivide(system, index, step, jd, end, levels - 1,
+                                           jd_ut)
+            timeline.append(period)
+            total_years += years[index]
+            jd = end
+        count += 1
+        index = (index + step) % n
 
     return {
-        "moon_longitude": round(moon_lon,3),
-        "nakshatra": nak_name,
-        "pada": pada,
-        "ruler": ruler,
-        "balance_years": round(bal_years,2),
+        "system": system,
+        "ruler": timeline[0]["lord"],
+        "balance_years": timeline[0]["years"],
         "table": timeline
     }
 
 
-def compute_antardasha(vim):
-    """Return Antardasha table for the first (current) Mahadasha"""
-    order = ['Ketu','Venus','Sun','Moon','Mars','Rahu','Jupiter','Saturn','Mercury']
-    years_table = {
-        'Ketu':7,'Venus':20,'Sun':6,'Moon':10,'Mars':7,
-        'Rahu':18,'Jupiter':16,'Saturn':19,'Mercury':17
+def active_periods(dasha, jd):
+    """Return the chain of periods (mahadasha, antardasha, ...) running at `jd`"""
+    chain = []
+    periods = dasha.get("table", [])
+
+    while periods:
+        i = bisect_right(periods, jd, key=lambda p: p["jd_start"]) - 1
+        if i < 0 or jd >= periods[i]["jd_end"]:
+            break
+        chain.append(periods[i])
+        periods = periods[i].get("sub", [])
+
+    return chain
+
+
+def compute_vimshottari(jd_ut, chart=None):
+    """Calculate Vimshottari Dasha periods"""
+    moon_lon = chart["planet_longitudes"]["Moon"] if chart else _moon_longitude(jd_ut)
+    dasha = _dasha_tree("vimshottari", jd_ut, {"Moon": moon_lon}, levels=1)
+    nak_index = int(moon_lon / NAKSHATRA_SPAN)
+    nak_frac = (moon_lon % NAKSHATRA_SPAN) / NAKSHATRA_SPAN
+
+    return {
+        "moon_longitude": round(moon_lon,3),
+        "nakshatra": NAK_NAMES[nak_index],
+        "pada": int(nak_frac * 4) + 1,
+        "ruler": dasha["ruler"],
+        "balance_years": dasha["balance_years"],
+        "table": dasha["table"]
     }
 
+
+def compute_antardasha(vim):
+    """Return Antardasha table for the first (birth) Mahadasha, from birth on"""
+    spec = DASHA_SYSTEMS["vimshottari"]
     first = vim['table'][0]
-    start_y, start_m, start_d = map(int, first['start'].split('-'))
-    jd = swe.julday(start_y, start_m, start_d)
-    mahadasha_years = first['years']
-    mahadasha_lord = first['lord']
-    seq = order[order.index(mahadasha_lord):] + order[:order.index(mahadasha_lord)]
-    subperiods = []
-    jd_start = jd
-
-    for lord in seq:
-        sub_years = mahadasha_years * (years_table[lord] / 120.0)
-        start = swe.revjul(jd_start)
-        jd_start += sub_years * 365.25
-        end = swe.revjul(jd_start)
-        subperiods.append({
-            "maha": mahadasha_lord,
-            "antar": lord,
-            "start": f"{int(start[0])}-{int(start[1]):02d}-{int(start[2]):02d}",
-            "end": f"{int(end[0])}-{int(end[1]):02d}-{int(end[2]):02d}",
-            "years": round(sub_years,2)
-        })
-    
-    return subperiods
+    index = spec.lords.index(first['lord'])
+    jd_end = first['jd_end']
+    jd_start = jd_end - spec.years[index] * DAYS_PER_YEAR
+
+    return [{
+        "maha": first['lord'],
+        "antar": sub["lord"],
+        "start": sub["start"],
+        "end": sub["end"],
+        "years": sub["years"]
+    } for sub in _subdivide("vimshottari", index, 1, jd_start, jd_end, 1,
+                            first['jd_start'])]
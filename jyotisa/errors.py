@@ -0,0 +1,7 @@
+"""
+Exceptions for invalid client-supplied options
+"""
+
+
+class InvalidOption(ValueError):
+    """An option name or value from the request that cannot be used"""
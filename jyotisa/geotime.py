@@ -0,0 +1,86 @@
+"""
+Geo-time normalization - local civil time to Julian day via the tz database
+"""
+from datetime import date as calendar_date, datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import swisseph as swe
+from timezonefinder import TimezoneFinder
+
+from .errors import InvalidOption
+
+_finder = None
+
+
+def parse_date_time(date, time):
+    """
+    Split "YYYY-MM-DD" and "HH:MM[:SS[.fff]]" into numeric fields,
+    rejecting malformed strings and impossible dates or times
+    """
+    try:
+        year, month, day = (int(x) for x in date.split("-"))
+        time_parts = time.split(":")
+        if len(time_parts) not in (2, 3):
+            raise ValueError
+        hour, minute = int(time_parts[0]), int(time_parts[1])
+        second = float(time_parts[2]) if len(time_parts) > 2 else 0.0
+    except ValueError:
+        raise InvalidOption(f"Malformed date/time: {date} {time}")
+
+    try:
+        calendar_date(year, month, day)
+    except ValueError:
+        raise InvalidOption(f"Invalid date: {date}")
+    if not (0 <= hour < 24 and 0 <= minute < 60 and 0 <= second < 60):
+        raise InvalidOption(f"Invalid time: {time}")
+    return year, month, day, hour, minute, second
+
+
+@lru_cache(maxsize=4096)
+def zone_for_coordinates(lat, lon):
+    """Look up the IANA zone name for a place from the offline boundary data"""
+    global _finder
+    if _finder is None:
+        _finder = TimezoneFinder()
+    return _finder.timezone_at(lat=lat, lng=lon) or "UTC"
+
+
+@lru_cache(maxsize=65536)
+def utc_offset(zone, year, month, day, hour, minute, second=0):
+    """
+    Historical UTC offset in hours for a local wall-clock time in `zone`
+
+    Wall times that occur twice (clocks set back) resolve to the first
+    occurrence, i.e. the offset in force before the change. Wall times
+    skipped by a forward change resolve to the offset before the gap as
+    well, so e.g. 02:30 on a spring-forward night is read as standard time.
+    """
+    try:
+        tzinfo = ZoneInfo(zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise InvalidOption(f"Unknown timezone: {zone}")
+    # fold=0 picks the pre-transition offset for ambiguous and skipped times
+    local = datetime(year, month, day, hour, minute, int(second),
+                     tzinfo=tzinfo, fold=0)
+    return local.utcoffset().total_seconds() / 3600.0
+
+
+def resolve_offset(date, time, lat, lon, timezone_offset=None, timezone=None):
+    """
+    Pick the UTC offset for a birth time: an explicit offset wins, then an
+    IANA zone name, then the zone containing the coordinates
+    """
+    if timezone_offset is not None:
+        return timezone_offset, timezone
+    if timezone is None:
+        timezone = zone_for_coordinates(round(lat, 4), round(lon, 4))
+    fields = parse_date_time(date, time)
+    return utc_offset(timezone, *fields), timezone
+
+
+def local_to_jd(date, time, offset):
+    """Julian day (UT) for a local date/time with seconds precision"""
+    year, month, day, hour, minute, second = parse_date_time(date, time)
+    hours = hour + minute / 60.0 + second / 3600.0 - offset
+    return swe.julday(year, month, day, hours)
@@ -3,6 +3,8 @@ Planetary strength calculations - Shad-Bala, Avastha, etc.
 """
 import swisseph as swe
 
+from . import core
+
 
 def compute_avastha(lon):
     """Calculate Avastha (age state) of a planet"""
@@ -19,11 +21,14 @@ def compute_avastha(lon):
         return "Mrita (dead)"
 
 
-def compute_shadbala(jd_ut, lat, lon, planet_data):
+def compute_shadbala(jd_ut, lat, lon, planet_data, flags=None):
     """
     Calculate simplified Shad-Bala (sixfold strength) for planets
     Note: This is a simplified version. Full Shad-Bala is extremely complex.
     """
+    if flags is None:
+        flags = core.chart_flags()
+
     # Natural strengths (Naisargika bala)
     naisargika = {
         "Sun": 60, "Moon": 51.43, "Mercury": 25.71,
@@ -41,10 +46,12 @@ def compute_shadbala(jd_ut, lat, lon, planet_data):
     planet_ids = {"Sun":swe.SUN, "Moon":swe.MOON, "Mercury":swe.MERCURY,
                   "Venus":swe.VENUS, "Mars":swe.MARS, "Jupiter":swe.JUPITER, "Saturn":swe.SATURN}
     
-    for name, pid in planet_ids.items():
-        result = swe.calc_ut(jd_ut, pid)
+    with core.ephemeris(flags, lat, lon):
+        results = {name: swe.calc_ut(jd_ut, pid, flags.iflag)
+                   for name, pid in planet_ids.items()}
+
+    for name, result in results.items():
         lon_planet = result[0][0]
-        speed = result[0][3] if len(result[0]) > 3 else 0
         
         # 1. Sthana bala (positional strength) - simplified
         sthana = 30 + (lon_planet % 30)
@@ -61,8 +68,11 @@ def compute_shadbala(jd_ut, lat, lon, planet_data):
         else:
             kala = 15
         
-        # 4. Cheshta bala (motional strength)
-        cheshta = 60 if speed < 0 else 30
+        # 4. Cheshta bala (motional strength) - needs speeds, skipped without them
+        if flags.speed:
+            cheshta = 60 if result[0][3] < 0 else 30
+        else:
+            cheshta = None
         
         # 5. Naisargika bala (natural strength)
         nais = naisargika.get(name, 30)
@@ -71,7 +81,8 @@ def compute_shadbala(jd_ut, lat, lon, planet_data):
         drik = 25
         
         # Total strength
-        total = sthana + dig + kala + cheshta + nais + drik
+        total = sthana + dig + kala + (cheshta or 0) + nais + drik
+        maximum = 390 if cheshta is not None else 330
         
         # Avastha
         avastha = compute_avastha(lon_planet)
@@ -80,11 +91,11 @@ def compute_shadbala(jd_ut, lat, lon, planet_data):
             "sthana_bala": round(sthana, 2),
             "dig_bala": round(dig, 2),
             "kala_bala": round(kala, 2),
-            "cheshta_bala": round(cheshta, 2),
+            "cheshta_bala": round(cheshta, 2) if cheshta is not None else None,
             "naisargika_bala": round(nais, 2),
             "drik_bala": round(drik, 2),
             "total_bala": round(total, 2),
-            "strength_percentage": round((total / 390) * 100, 1),
+            "strength_percentage": round((total / maximum) * 100, 1),
             "avastha": avastha
         }
     
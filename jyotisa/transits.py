@@ -4,28 +4,27 @@ Transit calculations - current and progressive transits
 import swisseph as swe
 from datetime import datetime
 
+from . import core
 
-def current_transits(lat, lon):
+
+def current_transits(lat, lon, flags=None):
     """Calculate current planetary transits"""
-    swe.set_sid_mode(swe.SIDM_LAHIRI)
+    if flags is None:
+        flags = core.chart_flags()
     now = datetime.utcnow()
     jd = swe.julday(now.year, now.month, now.day, now.hour + now.minute/60.0)
-    
-    planets = {"Sun":swe.SUN, "Moon":swe.MOON, "Mercury":swe.MERCURY,
-               "Venus":swe.VENUS, "Mars":swe.MARS, "Jupiter":swe.JUPITER,
-               "Saturn":swe.SATURN, "Rahu":swe.MEAN_NODE}
-    sign_names = ["Aries","Taurus","Gemini","Cancer","Leo","Virgo",
-                  "Libra","Scorpio","Sagittarius","Capricorn","Aquarius","Pisces"]
+
+    with core.ephemeris(flags, lat, lon):
+        results = [(name, core.calc_body(jd, pid, flags)) for name, pid in flags.planets]
+
     data = {}
     
-    for name, pid in planets.items():
-        result = swe.calc_ut(jd, pid)
-        lon = result[0][0] % 360.0
-        speed = result[0][3] if len(result[0]) > 3 else 0
+    for name, xx in results:
+        planet_lon = xx[0] % 360.0
         data[name] = {
-            "longitude": round(lon, 2),
-            "sign": sign_names[int(lon/30)],
-            "retrograde": speed < 0
+            "longitude": round(planet_lon, 2),
+            "sign": core.SIGN_NAMES[int(planet_lon/30)],
+            "retrograde": xx[3] < 0 if flags.speed else None
         }
     
     return data
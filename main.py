@@ -1,10 +1,14 @@
 # main.py
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
+import os
+import swisseph as swe
 
 # Import our jyotisa modules
-from jyotisa import core, dashas, divisional, transits, strengths, yogas, events
+from jyotisa import core, dashas, divisional, transits, strengths, yogas, events, alerts
 
 app = FastAPI(
     title="Swiss Ephemeris API - Professional Jyotish Engine",
@@ -16,11 +20,50 @@ app = FastAPI(
 # ----------  Request schemas ----------
 class ChartRequest(BaseModel):
     date: str  # "1984-06-22"
-    time: str  # "09:05"
-    timezone_offset: float  # +5.5
+    time: str  # "09:05" or "09:05:30"
+    timezone_offset: Optional[float] = None  # +5.5; overrides timezone
+    timezone: Optional[str] = None  # IANA zone, e.g. "Asia/Kolkata"; default from lat/lon
     lat: float
     lon: float
-    ayanamsa: str = "LAHIRI"  # Options: LAHIRI, RAMAN, KRISHNAMURTI
+    ayanamsa: str = "LAHIRI"  # Any Swiss Ephemeris ayanamsa: LAHIRI, RAMAN, KRISHNAMURTI, ...
+    house_system: str = "PLACIDUS"  # PLACIDUS, WHOLE_SIGN, EQUAL, SRIPATI, ...
+    node: str = "MEAN"  # MEAN or TRUE Rahu
+    speed: bool = True
+    topocentric: bool = False
+
+    def flags(self):
+        return core.chart_flags(self.ayanamsa, self.house_system, self.node,
+                                self.speed, self.topocentric)
+
+
+class NatalRegistration(ChartRequest):
+    chart_id: str
+
+
+# Natal indexes for this worker's shard of registered charts, one per
+# zodiac frame (ayanamsa + node) so natal and transit longitudes always
+# match; invalid shard settings fail at startup
+natal_index = alerts.NatalIndex(
+    shard=int(os.environ.get("ALERT_SHARD", "0")),
+    shard_count=int(os.environ.get("ALERT_SHARD_COUNT", "1")))
+natal_indexes = {core.chart_flags(): natal_index}
+
+
+def alert_flags(req):
+    """Geocentric frame of the request's ayanamsa and node, as used for transits"""
+    return core.chart_flags(req.ayanamsa, node=req.node)
+
+
+# Unknown ayanamsa / house system / node / timezone names
+@app.exception_handler(core.InvalidOption)
+def invalid_option_handler(request: Request, exc: core.InvalidOption):
+    return JSONResponse(status_code=400, content={"error": str(exc)})
+
+
+# Inputs the ephemeris cannot handle, e.g. dates outside its range
+@app.exception_handler(swe.Error)
+def ephemeris_error_handler(request: Request, exc: swe.Error):
+    return JSONResponse(status_code=400, content={"error": f"Ephemeris error: {exc}"})
 
 
 # ----------  Main Chart Endpoint ----------
@@ -41,10 +84,10 @@ def compute_chart(req: ChartRequest):
     # Core planetary positions
     chart_data = core.compute_positions(req.date, req.time,
                                         req.timezone_offset, req.lat, req.lon,
-                                        req.ayanamsa)
+                                        req.flags(), req.timezone)
 
     # Vimshottari Dasha
-    vim_dasha = dashas.compute_vimshottari(chart_data["jd"])
+    vim_dasha = dashas.compute_vimshottari(chart_data["jd"], chart_data)
     vim_dasha["antardasha"] = dashas.compute_antardasha(vim_dasha)
 
     # Divisional charts
@@ -56,7 +99,7 @@ def compute_chart(req: ChartRequest):
     # Planetary strengths
     shadbala = strengths.compute_shadbala(chart_data["jd"], chart_data["lat"],
                                           chart_data["lon"],
-                                          chart_data["planets"])
+                                          chart_data["planets"], req.flags())
 
     # Aspects
     vedic_asp = yogas.vedic_aspects(chart_data["planets"])
@@ -68,7 +111,10 @@ def compute_chart(req: ChartRequest):
                                         asc_sign_index)
 
     return {
-        "ayanamsa": req.ayanamsa,
+        "ayanamsa": chart_data["ayanamsa"],
+        "house_system": chart_data["house_system"],
+        "timezone": chart_data["timezone"],
+        "utc_offset": chart_data["utc_offset"],
         "chart": chart_data["planets"],
         "houses": chart_data["houses"],
         "divisional": div_charts,
@@ -82,6 +128,34 @@ def compute_chart(req: ChartRequest):
     }
 
 
+# ----------  Dasha Endpoint ----------
+@app.post("/compute_dasha")
+def compute_dasha(
+    req: ChartRequest,
+    system: str = Query(
+        "vimshottari",
+        description="Dasha system: vimshottari, yogini, ashtottari, chara"),
+    levels: int = Query(2, ge=1, le=3,
+                        description="Depth: 1 = Mahadasha, 2 = Antardasha, 3 = Pratyantardasha")):
+    """
+    Compute the dasha period tree for any supported system
+
+    Returns the period table and the periods running now
+    """
+    chart_data = core.compute_positions(req.date, req.time,
+                                        req.timezone_offset, req.lat, req.lon,
+                                        req.flags(), req.timezone)
+
+    dasha = dashas.compute_dasha(system, chart_data["jd"], chart_data, levels)
+
+    now = datetime.utcnow()
+    jd_now = swe.julday(now.year, now.month, now.day,
+                        now.hour + now.minute / 60.0)
+    dasha["active"] = [p["lord"] for p in dashas.active_periods(dasha, jd_now)]
+
+    return dasha
+
+
 # ----------  Transit Endpoint ----------
 @app.get("/transit_now")
 def transit_now(lat: float, lon: float):
@@ -111,10 +185,10 @@ def compute_transit_hits(req: ChartRequest,
     """
     # Get natal chart
     natal = core.compute_positions(req.date, req.time, req.timezone_offset,
-                                   req.lat, req.lon, req.ayanamsa)
+                                   req.lat, req.lon, req.flags(), req.timezone)
 
     # Get current transits
-    current = transits.current_transits(req.lat, req.lon)
+    current = transits.current_transits(req.lat, req.lon, req.flags())
 
     # Find hits
     hits = transits.compute_transit_hits(natal["planets"], current, orb)
@@ -127,6 +201,64 @@ def compute_transit_hits(req: ChartRequest,
     }
 
 
+# ----------  Transit Alert Endpoints ----------
+@app.post("/natal_index")
+def register_natal(req: NatalRegistration):
+    """
+    Store a chart's natal longitudes for batch transit alerts
+
+    Positions are geocentric in the chart's ayanamsa and node; house system
+    and topocentric options do not apply. Charts hashing to another shard
+    are not stored by this worker
+    """
+    shard = alerts.shard_of(req.chart_id, natal_index.shard_count)
+    if not natal_index.owns(req.chart_id):
+        return {"chart_id": req.chart_id, "registered": False, "shard": shard}
+
+    flags = alert_flags(req)
+    natal = core.compute_positions(req.date, req.time, req.timezone_offset,
+                                   req.lat, req.lon, flags, req.timezone)
+    index = natal_indexes.setdefault(
+        flags, alerts.NatalIndex(natal_index.shard, natal_index.shard_count))
+    # A chart re-registered in another frame must not alert twice
+    for other in list(natal_indexes.values()):
+        if other is not index:
+            other.remove(req.chart_id)
+    registered = index.add(req.chart_id, natal["planet_longitudes"])
+
+    return {
+        "chart_id": req.chart_id,
+        "registered": registered,
+        "shard": shard
+    }
+
+
+@app.get("/transit_alerts")
+def transit_alerts(orb: float = Query(3.0, description="Orb in degrees")):
+    """
+    Find every registered chart hit by today's transits
+
+    Returns transit conjunctions grouped by chart id for this worker's shard
+    """
+    hits = []
+    for flags, index in list(natal_indexes.items()):
+        if len(index):
+            current = transits.current_transits(0.0, 0.0, flags)
+            hits.extend(index.transit_hits(current, orb))
+
+    by_chart = {}
+    for hit in hits:
+        by_chart.setdefault(hit.pop("chart_id"), []).append(hit)
+
+    return {
+        "date_utc": datetime.utcnow().isoformat(),
+        "shard": natal_index.shard,
+        "charts_indexed": sum(len(index) for index in natal_indexes.values()),
+        "alerts": by_chart,
+        "total_hits": len(hits)
+    }
+
+
 # ----------  Event Analysis Endpoint ----------
 @app.post("/analyze_event")
 def analyze_event(
@@ -146,11 +278,17 @@ def analyze_event(
     # Get chart
     chart_data = core.compute_positions(req.date, req.time,
                                         req.timezone_offset, req.lat, req.lon,
-                                        req.ayanamsa)
+                                        req.flags(), req.timezone)
 
     # Get current dasha
-    vim_dasha = dashas.compute_vimshottari(chart_data["jd"])
-    current_dasha_lord = vim_dasha["ruler"]
+    vim_dasha = dashas.compute_dasha("vimshottari", chart_data["jd"],
+                                     chart_data, levels=1)
+    now = datetime.utcnow()
+    active = dashas.active_periods(
+        vim_dasha,
+        swe.julday(now.year, now.month, now.day,
+                   now.hour + now.minute / 60.0))
+    current_dasha_lord = active[0]["lord"] if active else vim_dasha["ruler"]
 
     # Analyze event potential
     analysis = events.analyze_event_potential(event_type,
@@ -180,15 +318,22 @@ def root():
         "status":
         "active",
         "features": [
-            "Planetary positions (Lahiri/Raman/Krishnamurti ayanamsa)",
-            "Vimshottari Dasha & Antardasha", "8 Divisional charts (D1-D60)",
+            "Sidereal positions (any Swiss Ephemeris ayanamsa, true/mean node, topocentric)",
+            "House systems (Placidus, Whole Sign, Equal, Sripati, ...)",
+            "Historical timezone/DST resolution (IANA zone or coordinates)",
+            "Vimshottari Dasha & Antardasha",
+            "Yogini, Ashtottari & Chara Dasha", "8 Divisional charts (D1-D60)",
             "Shad-Bala strength calculations", "Vedic & Western aspects",
-            "Yoga detection", "Transit analysis", "Event timing analysis"
+            "Yoga detection", "Transit analysis", "Sharded transit alerts",
+            "Event timing analysis"
         ],
         "endpoints": {
             "POST /compute_chart": "Complete birth chart calculation",
+            "POST /compute_dasha": "Dasha periods for any supported system",
             "GET /transit_now": "Current planetary transits",
             "POST /transit_hits": "Transit conjunctions to natal chart",
+            "POST /natal_index": "Register a chart for transit alerts",
+            "GET /transit_alerts": "Transit conjunctions across registered charts",
             "POST /analyze_event": "Event timing analysis",
             "GET /docs": "Interactive API documentation"
         }
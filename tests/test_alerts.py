@@ -0,0 +1,113 @@
+"""
+Natal longitude index: agreement with per-chart transit hits, sharding and frames
+"""
+import random
+
+import pytest
+
+pytest.importorskip("swisseph")
+
+from jyotisa import alerts, transits
+
+PLANETS = ("Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Rahu")
+
+
+def _random_charts(count, seed=7):
+    rng = random.Random(seed)
+    charts = {f"chart-{i}": {planet: rng.uniform(0.0, 360.0) for planet in PLANETS}
+              for i in range(count)}
+    # Natal planets on both sides of the 0/360 seam
+    charts["seam"] = dict(zip(PLANETS, (359.2, 0.4, 358.1, 1.7, 357.05, 2.95,
+                                        180.0, 0.0)))
+    return charts
+
+
+def _hit_key(hit):
+    return (hit.get("chart_id"), hit["transit_planet"], hit["natal_planet"],
+            hit["orb"], hit["exact"])
+
+
+@pytest.mark.parametrize("orb", [1.0, 3.0, 10.0, 200.0])
+@pytest.mark.parametrize("transit_lon", [0.0, 0.3, 1.9, 358.9, 359.99, 90.0])
+def test_index_matches_compute_transit_hits(transit_lon, orb):
+    charts = _random_charts(200)
+    index = alerts.NatalIndex()
+    for chart_id, lons in charts.items():
+        assert index.add(chart_id, lons)
+
+    current = {"Moon": {"longitude": transit_lon},
+               "Saturn": {"longitude": (transit_lon + 123.4) % 360.0},
+               "Ascendant": {"longitude": transit_lon}}
+
+    expected = []
+    for chart_id, lons in charts.items():
+        natal = {planet: {"longitude": lon} for planet, lon in lons.items()}
+        for hit in transits.compute_transit_hits(natal, current, orb):
+            expected.append(dict(hit, chart_id=chart_id))
+
+    got = index.transit_hits(current, orb)
+    assert sorted(map(_hit_key, got)) == sorted(map(_hit_key, expected))
+    if transit_lon == 0.0 and orb == 3.0:
+        assert {h["natal_planet"] for h in got if h["chart_id"] == "seam"} >= \
+            {"Sun", "Moon", "Mercury", "Venus", "Rahu"}
+
+
+def test_index_follows_replace_and_remove():
+    index = alerts.NatalIndex()
+    index.add("a", {"Sun": 10.0, "Ascendant": 10.0})
+    assert [h["natal_planet"] for h in index.transit_hits({"Sun": {"longitude": 10.0}})] \
+        == ["Sun"]
+
+    index.add("a", {"Sun": 200.0})
+    assert index.transit_hits({"Sun": {"longitude": 10.0}}) == []
+    index.remove("a")
+    assert len(index) == 0
+    assert index.transit_hits({"Sun": {"longitude": 200.0}}) == []
+
+
+@pytest.mark.parametrize("shard,shard_count", [(0, 0), (-1, 2), (2, 2), (5, 1)])
+def test_shard_validation(shard, shard_count):
+    with pytest.raises(ValueError):
+        alerts.NatalIndex(shard, shard_count)
+
+
+def test_shards_partition_charts():
+    shard_count = 4
+    indexes = [alerts.NatalIndex(shard, shard_count) for shard in range(shard_count)]
+    charts = _random_charts(100)
+
+    for chart_id, lons in charts.items():
+        accepted = [index.add(chart_id, lons) for index in indexes]
+        assert accepted.count(True) == 1
+        assert accepted.index(True) == alerts.shard_of(chart_id, shard_count)
+
+    assert sum(len(index) for index in indexes) == len(charts)
+
+
+def test_reregistering_in_another_frame_moves_the_chart():
+    pytest.importorskip("timezonefinder")
+    pytest.importorskip("httpx")
+    testclient = pytest.importorskip("fastapi.testclient")
+    import main
+
+    client = testclient.TestClient(main.app)
+    birth = {"chart_id": "frame-move", "date": "1984-06-22", "time": "09:05:00",
+             "timezone_offset": 5.5, "lat": 28.61, "lon": 77.21}
+
+    def alerts_for_chart():
+        response = client.get("/transit_alerts", params={"orb": 180.0})
+        assert response.status_code == 200
+        return response.json()["alerts"].get("frame-move", [])
+
+    assert client.post("/natal_index", json=birth).json()["registered"]
+    # Every transit planet is within 180 degrees of every natal planet
+    assert len(alerts_for_chart()) == len(PLANETS) ** 2
+
+    moved = dict(birth, ayanamsa="RAMAN", node="TRUE")
+    assert client.post("/natal_index", json=moved).json()["registered"]
+    assert len(alerts_for_chart()) == len(PLANETS) ** 2
+
+    raman = main.alert_flags(main.NatalRegistration(**moved))
+    lahiri = main.alert_flags(main.NatalRegistration(**birth))
+    assert len(main.natal_indexes[raman]) == 1
+    assert len(main.natal_indexes[lahiri]) == 0
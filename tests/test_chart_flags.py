@@ -0,0 +1,75 @@
+"""
+Correctness matrix for per-request ayanamsa, house system, node and flag options
+"""
+import itertools
+
+import pytest
+
+swe = pytest.importorskip("swisseph")
+pytest.importorskip("timezonefinder")
+
+from jyotisa import core
+
+BIRTH = ("1984-06-22", "09:05:00", 5.5, 28.61, 77.21)
+
+MATRIX = list(itertools.product(sorted(core.AYANAMSAS), sorted(core.HOUSE_SYSTEMS),
+                                sorted(core.NODES), [True, False], [False, True]))
+
+
+def _arc(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def _tropical_minus_ayanamsa(jd, pid, flags):
+    with core.ephemeris(flags):
+        tropical = swe.calc_ut(jd, pid)[0][0]
+        return (tropical - swe.get_ayanamsa_ut(jd)) % 360.0
+
+
+@pytest.mark.parametrize("ayanamsa,house_system,node,speed,topocentric", MATRIX)
+def test_chart_flags_matrix(ayanamsa, house_system, node, speed, topocentric):
+    flags = core.chart_flags(ayanamsa, house_system, node, speed, topocentric)
+    chart = core.compute_positions(*BIRTH, flags=flags)
+    jd = chart["jd"]
+    lons = chart["planet_longitudes"]
+
+    # Sidereal = tropical - ayanamsa (within nutation and topocentric parallax)
+    assert _arc(lons["Sun"], _tropical_minus_ayanamsa(jd, swe.SUN, flags)) < 0.01
+    assert _arc(lons["Rahu"], _tropical_minus_ayanamsa(jd, core.NODES[node], flags)) < 0.01
+
+    cusps = [chart["houses"][str(i)] for i in range(1, 13)]
+    if house_system == "WHOLE_SIGN":
+        assert all(_arc(cusp, round(cusp / 30) * 30) < 1e-3 for cusp in cusps)
+    if house_system == "EQUAL":
+        assert _arc(cusps[0], chart["ascendant"]) < 1e-3
+        assert all(abs((cusps[(i + 1) % 12] - cusps[i]) % 360 - 30) < 1e-2
+                   for i in range(12))
+
+
+@pytest.mark.parametrize("ayanamsa", sorted(core.AYANAMSAS))
+def test_true_and_mean_node_differ(ayanamsa):
+    mean = core.compute_positions(*BIRTH, flags=core.chart_flags(ayanamsa, node="MEAN"))
+    true = core.compute_positions(*BIRTH, flags=core.chart_flags(ayanamsa, node="TRUE"))
+    diff = _arc(mean["planet_longitudes"]["Rahu"], true["planet_longitudes"]["Rahu"])
+    assert 0.01 < diff < 2.0
+
+
+def test_chart_flags_case_insensitive_and_validated():
+    assert core.chart_flags("lahiri", "whole_sign", "true") is \
+        core.chart_flags("LAHIRI", "WHOLE_SIGN", "TRUE")
+    with pytest.raises(core.InvalidOption):
+        core.chart_flags("NOT_AN_AYANAMSA")
+    with pytest.raises(core.InvalidOption):
+        core.chart_flags(house_system="NOT_A_HOUSE_SYSTEM")
+
+
+@pytest.mark.parametrize("speed", [True, False])
+def test_retrograde_needs_speed(speed):
+    chart = core.compute_positions(*BIRTH, flags=core.chart_flags(speed=speed))
+    retrograde = [data["retrograde"] for name, data in chart["planets"].items()
+                  if name != "Ascendant"]
+    if speed:
+        # The mean node always moves backwards
+        assert chart["planets"]["Rahu"]["retrograde"] is True
+    else:
+        assert retrograde == [None] * len(retrograde)
@@ -0,0 +1,143 @@
+"""
+Dasha engine: starting points, cycle lengths, birth clipping and period lookup
+"""
+import pytest
+
+pytest.importorskip("swisseph")
+
+from jyotisa import dashas
+
+JD_BIRTH = 2445873.6493  # 1984-06-22 03:35 UT
+SPAN = dashas.NAKSHATRA_SPAN
+
+# Ascendant in Aries; Aries, Taurus, Leo, Sagittarius and Capricorn hold their
+# own lords, and Ketu (Rahu in Taurus) occupies Scorpio
+CHARA_LONS = {"Ascendant": 15.0, "Mars": 10.0, "Venus": 45.0, "Mercury": 100.0,
+              "Moon": 200.0, "Sun": 130.0, "Jupiter": 250.0, "Saturn": 280.0,
+              "Rahu": 40.0}
+
+
+def _years(period):
+    return (period["jd_end"] - period["jd_start"]) / dashas.DAYS_PER_YEAR
+
+
+@pytest.mark.parametrize("moon", [0.0, 5.0, 100.0, 200.0 + SPAN / 3, 359.9])
+def test_vimshottari_balance_and_full_cycle(moon):
+    spec = dashas.DASHA_SYSTEMS["vimshottari"]
+    dasha = dashas._dasha_tree("vimshottari", JD_BIRTH, {"Moon": moon}, 1)
+    table = dasha["table"]
+
+    index = int(moon / SPAN) % 9
+    balance = (1 - (moon % SPAN) / SPAN) * spec.years[index]
+    assert table[0]["lord"] == spec.lords[index]
+    assert table[0]["jd_start"] == JD_BIRTH
+    assert _years(table[0]) == pytest.approx(balance)
+
+    # Birth dasha elapsed before birth plus the table make one 120-year cycle
+    elapsed = spec.years[index] - balance
+    assert elapsed + sum(_years(p) for p in table) == pytest.approx(120.0)
+    assert [p["lord"] for p in table[:9]] == \
+        [spec.lords[(index + k) % 9] for k in range(9)]
+
+
+@pytest.mark.parametrize("nakshatra,yogini", [
+    ("Ashwini", "Bhramari"), ("Bharani", "Bhadrika"), ("Ardra", "Mangala"),
+    ("Pushya", "Dhanya"), ("Mula", "Ulka"), ("Revati", "Ulka")])
+def test_yogini_nakshatra_lord(nakshatra, yogini):
+    moon = dashas.NAK_NAMES.index(nakshatra) * SPAN + SPAN / 2
+    index, elapsed, _, _ = dashas._yogini_start({"Moon": moon})
+    assert dashas.DASHA_SYSTEMS["yogini"].lords[index] == yogini
+    assert elapsed == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("moon,lord,elapsed", [
+    # Ardra opens the Sun's group; Mrigashira closes Venus'
+    (5 * SPAN, "Sun", 0.0),
+    (5 * SPAN - 1e-9, "Venus", 1.0),
+    # Rahu's group (Uttara Bhadrapada to Bharani) runs across Revati's end
+    (25 * SPAN, "Rahu", 0.0),
+    (360.0 - 1e-9, "Rahu", 0.5),
+    (0.0, "Rahu", 0.5),
+    (2 * SPAN - 1e-9, "Rahu", 1.0),
+    (2 * SPAN, "Venus", 0.0)])
+def test_ashtottari_group_boundaries(moon, lord, elapsed):
+    index, frac, _, _ = dashas._ashtottari_start({"Moon": moon})
+    assert dashas.DASHA_SYSTEMS["ashtottari"].lords[index] == lord
+    assert frac == pytest.approx(elapsed, abs=1e-6)
+
+
+def test_chara_co_lord_in_sign_counts_to_the_other():
+    # Ketu occupies Scorpio, so count to Mars in Aries (savya: 5 signs)
+    assert dashas._chara_years(7, CHARA_LONS) == 5
+    # Neither co-lord in Aquarius: the longer of Saturn (1) and Rahu (9)
+    assert dashas._chara_years(10, CHARA_LONS) == 9
+    # Both co-lords in Scorpio
+    assert dashas._chara_years(7, dict(CHARA_LONS, Mars=220.0)) == 12
+
+
+def test_chara_second_cycle():
+    first = [dashas._chara_years(sign, CHARA_LONS) for sign in range(12)]
+    assert first[0] == first[1] == first[9] == 12
+
+    table = dashas._dasha_tree("chara", JD_BIRTH, CHARA_LONS, 1)["table"]
+    expected = [(dashas.SIGN_NAMES[s], first[s]) for s in range(12)]
+    # Second cycle runs 12 less the first-cycle years; zero-year signs are skipped
+    expected += [(dashas.SIGN_NAMES[s], 12 - first[s]) for s in range(12)
+                 if first[s] < 12]
+
+    got = [(p["lord"], round(_years(p), 6)) for p in table]
+    assert len(got) > 12
+    assert got == expected[:len(got)]
+    assert sum(y for _, y in got) >= dashas.HORIZON_YEARS
+
+
+@pytest.mark.parametrize("system", sorted(dashas.DASHA_SYSTEMS))
+def test_sub_periods_start_at_birth(system):
+    lons = dict(CHARA_LONS, Moon=200.0 + SPAN / 3)
+    table = dashas._dasha_tree(system, JD_BIRTH, lons, 3)["table"]
+
+    def check(periods, start, end):
+        assert periods[0]["jd_start"] == pytest.approx(start)
+        assert periods[-1]["jd_end"] == pytest.approx(end)
+        for before, after in zip(periods, periods[1:]):
+            assert before["jd_end"] == pytest.approx(after["jd_start"])
+        for period in periods:
+            if "sub" in period:
+                check(period["sub"], period["jd_start"], period["jd_end"])
+
+    check(table, JD_BIRTH, table[-1]["jd_end"])
+
+
+def test_antardasha_from_birth():
+    moon = 200.0 + SPAN / 3
+    vim = dashas.compute_vimshottari(JD_BIRTH, {"planet_longitudes": {"Moon": moon}})
+    antar = dashas.compute_antardasha(vim)
+    assert antar[0]["start"] == vim["table"][0]["start"]
+    assert antar[-1]["end"] == vim["table"][0]["end"]
+    assert sum(a["years"] for a in antar) == pytest.approx(vim["balance_years"], abs=0.05)
+
+
+def test_active_periods_at_boundaries():
+    dasha = dashas._dasha_tree("vimshottari", JD_BIRTH, {"Moon": 100.0}, 2)
+    table = dasha["table"]
+
+    assert dashas.active_periods(dasha, JD_BIRTH - 1e-6) == []
+    assert dashas.active_periods(dasha, JD_BIRTH)[0] is table[0]
+    assert dashas.active_periods(dasha, table[-1]["jd_end"]) == []
+
+    # A boundary belongs to the period it starts
+    boundary = table[1]["jd_start"]
+    chain = dashas.active_periods(dasha, boundary)
+    assert chain == [table[1], table[1]["sub"][0]]
+    chain = dashas.active_periods(dasha, boundary - 1e-6)
+    assert chain == [table[0], table[0]["sub"][-1]]
+
+    sub = table[1]["sub"][2]
+    assert dashas.active_periods(dasha, sub["jd_start"]) == [table[1], sub]
+
+
+def test_unknown_system_and_chara_without_chart():
+    with pytest.raises(dashas.core.InvalidOption):
+        dashas.compute_dasha("kalachakra", JD_BIRTH)
+    with pytest.raises(ValueError):
+        dashas.compute_dasha("chara", JD_BIRTH)
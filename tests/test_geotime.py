@@ -0,0 +1,58 @@
+"""
+Local civil time to UTC offset and Julian day, around DST transitions
+"""
+import pytest
+
+swe = pytest.importorskip("swisseph")
+pytest.importorskip("timezonefinder")
+
+from jyotisa import geotime
+from jyotisa.errors import InvalidOption
+
+
+@pytest.mark.parametrize("zone,date,time,offset", [
+    # Spring forward: 02:00-03:00 does not exist and reads as standard time
+    ("America/New_York", "2023-03-12", "01:59", -5.0),
+    ("America/New_York", "2023-03-12", "02:30", -5.0),
+    ("America/New_York", "2023-03-12", "03:00", -4.0),
+    ("Europe/London", "2023-03-26", "01:30", 0.0),
+    # Fall back: 01:00-02:00 happens twice and reads as the first (daylight) pass
+    ("America/New_York", "2023-11-05", "00:59", -4.0),
+    ("America/New_York", "2023-11-05", "01:30", -4.0),
+    ("America/New_York", "2023-11-05", "02:00", -5.0),
+    ("Europe/London", "2023-10-29", "01:30", 1.0),
+    # No DST at all
+    ("Asia/Kolkata", "1984-06-22", "09:05", 5.5),
+])
+def test_utc_offset_on_transition_nights(zone, date, time, offset):
+    fields = geotime.parse_date_time(date, time)
+    assert geotime.utc_offset(zone, *fields) == offset
+
+
+def test_resolve_offset_precedence():
+    birth = ("2023-07-01", "12:00", 40.71, -74.01)
+    assert geotime.resolve_offset(*birth, timezone_offset=1.0) == (1.0, None)
+    assert geotime.resolve_offset(*birth, timezone="Asia/Tokyo") == (9.0, "Asia/Tokyo")
+    assert geotime.resolve_offset(*birth) == (-4.0, "America/New_York")
+
+
+def test_local_to_jd_applies_offset():
+    jd = geotime.local_to_jd("2023-11-05", "01:30:30", -4.0)
+    assert jd == pytest.approx(swe.julday(2023, 11, 5, 5.5 + 30 / 3600.0))
+
+
+@pytest.mark.parametrize("zone", ["Mars/Olympus_Mons", "", "../etc/passwd"])
+def test_unknown_zone(zone):
+    with pytest.raises(ValueError):
+        geotime.utc_offset(zone, 2023, 1, 1, 12, 0)
+
+
+@pytest.mark.parametrize("date,time", [
+    ("2023-02-30", "10:00"), ("2023-13-01", "10:00"), ("2023-02-28", "24:00"),
+    ("2023-02-28", "10:60"), ("2023-02-28", "10:00:60"), ("2023-02", "10:00"),
+    ("2023-02-28", "10"), ("today", "10:00")])
+def test_parse_date_time_rejects_impossible_values(date, time):
+    with pytest.raises(InvalidOption):
+        geotime.parse_date_time(date, time)
+    with pytest.raises(InvalidOption):
+        geotime.local_to_jd(date, time, 5.5)